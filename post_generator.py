@@ -3,13 +3,19 @@ import sys
 import json
 import random
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import re
+import time
+import hashlib
 from io import BytesIO
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache, partial
 from PIL import Image
-from atproto import Client, models, client_utils
-import anthropic
+# atproto and anthropic cost ~1s to import; they are pulled in only once a slot is actually running
 
 # --- LOGGING SETUP ---
 logging.basicConfig(
@@ -21,6 +27,12 @@ logger = logging.getLogger()
 
 # --- CONSTANTS ---
 RANDOM_PROMO_CHANCE = 0.33 
+MAX_BLOB_BYTES = 950000
+MAX_DOWNLOAD_BYTES = 8 * 1024 * 1024
+PROMO_PATH = "images/promo_ad.jpg"
+PROMO_BYTES = None
+if os.path.exists(PROMO_PATH):
+    with open(PROMO_PATH, 'rb') as f: PROMO_BYTES = f.read()
 
 FRANCHISE_MAP = {
     "ZELDA": "#LegendOfZelda", "MARIO": "#SuperMario", "METROID": "#Metroid",
@@ -32,20 +44,56 @@ FRANCHISE_MAP = {
     "TEKKEN": "#Tekken", "MORTAL KOMBAT": "#MortalKombat", "PAC-MAN": "#PacMan",
     "EVERMORE": "#SecretOfEvermore", "CHRONO": "#ChronoTrigger"
 }
+NON_ALNUM_RE = re.compile(r'[^a-zA-Z0-9]')
+FRANCHISE_RE = re.compile("|".join(re.escape(k) for k in sorted(FRANCHISE_MAP, key=len, reverse=True)))
 
 RETRO_PLATFORMS = {
     167: "Sega Genesis", 79: "SNES", 24: "GBA", 27: "PS1", 15: "PS2", 
     83: "N64", 106: "Dreamcast", 80: "Xbox", 49: "NES", 105: "GameCube",
     109: "TurboGrafx-16", 117: "Sega 32X", 119: "Sega CD", 12: "Neo Geo", 43: "GBC"
 }
+# Hashtag per platform id, built once; names that would exceed 20 chars get none
+PLATFORM_HASHTAGS = {pid: f"#{name.replace(' ', '')}" for pid, name in RETRO_PLATFORMS.items() if len(name.replace(' ', '')) < 20}
 RETRO_IDS_STR = ",".join(map(str, RETRO_PLATFORMS.keys()))
+CLAUDE_MODEL = "claude-3-haiku-20240307"
+CLAUDE_MAX_TOKENS = 80  # ~100 chars is ~30 tokens; leaves headroom without reserving a long decode
+# Shared rules for every Claude call; the user turn only carries the per-post ask
+CLAUDE_SYSTEM_PROMPT = (
+    "You write posts for a retro gaming Bluesky account. "
+    "Max 100 chars. Do not use hashtags or quotation marks."
+)
+HISTORY_FILE = 'history_games.json'
+HISTORY_LIMIT = 2000
+
+# Blob refs of static uploads (promo card); committed with the history files by the workflow
+BLOB_CACHE_FILE = 'blob_cache.json'
+BLOB_CACHE_TTL = 7 * 24 * 3600
+
+# Quotes and stray hashtags from Claude; real tags are added as facets
+CLAUDE_STRIP_TABLE = str.maketrans('', '', '"#')
+
+# Shared keep-alive pool for RAWG API + media CDN; sized for the parallel downloaders
+MAX_WORKERS = 6
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=MAX_WORKERS * 2,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# RAWG CDN resize width: above Bluesky's display size, still >600px tall for collage tiles
+RAWG_IMAGE_WIDTH = 1280
+
 GENRES = {"Platformer": 83, "Shooter": 2, "RPG": 5, "Fighting": 6, "Racing": 1}
+GENRE_CHOICES = tuple(GENRES.items())
 
 SCHEDULE = {
     0: {9: 1, 15: 2, 21: 13}, 1: {9: 9, 15: 3, 21: 14}, 2: {9: 4, 15: 17, 21: 13},
     3: {9: 6, 15: 18, 21: 14}, 4: {9: 9, 15: 8, 21: 13}, 5: {9: 9, 15: 10, 21: 15},
     6: {9: 11, 15: 12, 21: 13}
 }
+# Indexed by weekday * 24 + hour; 0 means no slot
+SCHEDULE_FLAT = tuple(SCHEDULE.get(d, {}).get(h, 0) for d in range(7) for h in range(24))
+SLOT_RE = re.compile(r'Slot\s*(\d+)')
 
 # --- HELPERS ---
 
@@ -53,169 +101,261 @@ def load_json(filename, default):
     try:
         if os.path.exists(filename):
             with open(filename, 'r') as f: return json.load(f)
-    except: pass
+    except (OSError, ValueError): pass
     return default
 
 def save_json(filename, data):
+    tmp = f"{filename}.tmp"
     try:
-        with open(filename, 'w') as f: json.dump(data, f)
-    except: pass
+        with open(tmp, 'w') as f: json.dump(data, f)
+        os.replace(tmp, filename)
+    except (OSError, TypeError): pass
+
+def rawg_resized(url, width=RAWG_IMAGE_WIDTH):
+    """Points RAWG media URLs at the CDN's pre-scaled copy instead of the multi-MB original"""
+    if not url or "media.rawg.io/media/" not in url or "/media/resize/" in url: return url
+    return url.replace("media.rawg.io/media/", f"media.rawg.io/media/resize/{width}/-/", 1)
+
+@lru_cache(maxsize=1)
+def load_game_history():
+    """Read once per process; the On This Day probes and rivalry all share it"""
+    return tuple(load_json(HISTORY_FILE, []))
+
+@lru_cache(maxsize=1)
+def load_game_history_ids():
+    return frozenset(load_game_history())
+
+def record_game_history(game_id):
+    history = deque(load_game_history(), maxlen=HISTORY_LIMIT)
+    history.append(game_id)
+    save_json(HISTORY_FILE, list(history))
+    load_game_history.cache_clear()
+    load_game_history_ids.cache_clear()
 
 def download_image(url):
+    """Returns the raw image bytes; Image.open only sniffs the header to reject non-image bodies"""
     if not url: return None
     try:
-        resp = requests.get(url, timeout=12)
-        return Image.open(BytesIO(resp.content)) if resp.status_code == 200 else None
-    except: return None
+        # Stream so an oversized original is abandoned instead of buffered whole
+        with SESSION.get(url, timeout=12, stream=True) as resp:
+            if resp.status_code != 200: return None
+            if int(resp.headers.get('Content-Length') or 0) > MAX_DOWNLOAD_BYTES: return None
+            data = bytearray()
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                data += chunk
+                if len(data) > MAX_DOWNLOAD_BYTES: return None
+        Image.open(BytesIO(data))
+        return bytes(data)
+    except (requests.RequestException, OSError, Image.DecompressionBombError): return None
+
+def download_images(urls):
+    """Downloads concurrently; results keep the order of urls (None for failures)"""
+    urls = list(urls)
+    if len(urls) < 2: return [download_image(u) for u in urls]
+    with ThreadPoolExecutor(max_workers=min(len(urls), MAX_WORKERS)) as ex:
+        return list(ex.map(download_image, urls))
 
 def image_to_bytes(img):
+    if img.mode != "RGB": img = img.convert("RGB")
     quality = 85
     for _ in range(5):
         buf = BytesIO()
-        temp_img = img.convert("RGB")
-        temp_img.save(buf, format="JPEG", quality=quality)
+        img.save(buf, format="JPEG", quality=quality, optimize=True)
         data = buf.getvalue()
-        if len(data) < 950000: return data
+        if len(data) < MAX_BLOB_BYTES: return data
         quality -= 15
     return data
 
+def to_upload_bytes(item):
+    """Downloaded JPEGs that already fit go up untouched; anything else is (re-)encoded"""
+    if isinstance(item, bytes):
+        if item[:2] == b"\xff\xd8" and len(item) < MAX_BLOB_BYTES: return item
+        item = Image.open(BytesIO(item))
+    return image_to_bytes(item)
+
 def create_collage(images):
     if not images or len(images) < 2: return images[0] if images else None
     target_h = 600
-    resized = [img.resize((int(target_h * (img.width/img.height)), target_h)) for img in images[:2]]
-    total_w = sum(i.width for i in resized)
+    resized, total_w = [], 0
+    for img in images[:2]:
+        w = int(target_h * (img.width/img.height))
+        img.draft("RGB", (w, target_h))  # JPEG: let libjpeg decode at 1/2, 1/4.. scale, never below target
+        if img.mode != "RGB": img = img.convert("RGB")  # plain RGB paste, no per-pixel alpha/palette work
+        resized.append(img if img.size == (w, target_h) else img.resize((w, target_h), reducing_gap=2.0))
+        total_w += w
     collage = Image.new('RGB', (total_w, target_h))
     x = 0
     for i in resized: collage.paste(i, (x,0)); x += i.width
     return collage
 
 def clean_game_hashtag(game_name, current_tags):
-    upper = game_name.upper()
-    for k, v in FRANCHISE_MAP.items():
-        if k in upper: return v
-    clean = re.sub(r'[^a-zA-Z0-9]', '', "".join(game_name.split(':')[0].split('-')[0].split()[:2]))
+    match = FRANCHISE_RE.search(game_name.upper())
+    if match: return FRANCHISE_MAP[match.group(0)]
+    clean = NON_ALNUM_RE.sub('', "".join(game_name.split(':')[0].split('-')[0].split()[:2]))
     tag = f"#{clean}"
     if len(tag) > 20 or len(clean) < 2:
         return "#Nostalgia" if "#Nostalgia" not in current_tags else None
     return tag
 
 def get_platform_tags(game_data):
-    found = []
     for p in game_data.get('platforms', []):
         pid = p['platform']['id']
         if pid in RETRO_PLATFORMS:
-            tag = f"#{RETRO_PLATFORMS[pid].replace(' ', '')}"
-            if len(tag) <= 20: found.append(tag)
-            break
-    return found[:1] if found else ["#RetroGaming"]
+            tag = PLATFORM_HASHTAGS.get(pid)
+            return [tag] if tag else ["#RetroGaming"]
+    return ["#RetroGaming"]
 
 def fetch_games_list(api_key, count=1, genre_id=None, dates=None):
     url = f"https://api.rawg.io/api/games?key={api_key}&platforms={RETRO_IDS_STR}&page_size=40"
     if genre_id: url += f"&genres={genre_id}"
     if dates: url += f"&dates={dates}"
     try:
-        resp = requests.get(url, timeout=10).json()
+        resp = SESSION.get(url, timeout=10).json()
         results = resp.get('results', [])
-        history = load_json('history_games.json', [])
+        history = load_game_history_ids()
         available = [g for g in results if g['id'] not in history]
         if not available: available = results
         return random.sample(available, min(len(available), count))
-    except: return []
+    except (requests.RequestException, ValueError, KeyError): return []
 
 def deep_fetch_game(api_key, game_id):
     url = f"https://api.rawg.io/api/games/{game_id}?key={api_key}"
-    try: return requests.get(url, timeout=10).json()
-    except: return None
-
-def get_deep_images(api_key, full_game_obj, limit=3):
-    """Core logic to ensure we get unique images (Box Art + Screens)"""
-    final_imgs = []
-    seen_urls = set()
-
-    def add_from_url(url):
-        if url and url not in seen_urls and len(final_imgs) < limit:
-            img = download_image(url)
-            if img:
-                final_imgs.append(img)
-                seen_urls.add(url)
+    try: return SESSION.get(url, timeout=10).json()
+    except (requests.RequestException, ValueError): return None
 
+def iter_image_urls(api_key, full_game_obj):
+    """Yields candidate image URLs in priority order; the screenshot API is only hit if consumed"""
     # 1. Box Art / Additional
-    add_from_url(full_game_obj.get('background_image_additional'))
+    yield full_game_obj.get('background_image_additional')
     # 2. Main Background
-    add_from_url(full_game_obj.get('background_image'))
-    
-    # 3. Deep Screenshot API Fetch
+    yield full_game_obj.get('background_image')
+
+    # 3. Short screenshots carried over from the list response (no extra request)
+    for s in full_game_obj.get('short_screenshots', []): yield s.get('image')
+
+    # 4. Fallback to Deep Screenshot API Fetch
     try:
         ss_url = f"https://api.rawg.io/api/games/{full_game_obj['id']}/screenshots?key={api_key}"
-        res = requests.get(ss_url, timeout=10).json().get('results', [])
-        for s in res:
-            add_from_url(s.get('image'))
-            if len(final_imgs) >= limit: break
-    except: pass
-
-    # 4. Fallback to short screenshots list
-    if len(final_imgs) < limit:
-        for s in full_game_obj.get('short_screenshots', []):
-            add_from_url(s.get('image'))
-            if len(final_imgs) >= limit: break
-            
+        res = SESSION.get(ss_url, timeout=10).json().get('results', [])
+    except (requests.RequestException, ValueError): res = []
+    for s in res: yield s.get('image')
+
+def get_deep_images(api_key, full_game_obj, limit=3):
+    """Core logic to ensure we get unique images (Box Art + Screens), as raw downloaded bytes"""
+    final_imgs = []
+    seen_urls = set()
+    candidates = iter_image_urls(api_key, full_game_obj)
+    while len(final_imgs) < limit:
+        # Pull just enough unseen URLs to fill the gap, then fetch them together
+        batch = []
+        for url in candidates:
+            url = rawg_resized(url)
+            if not url or url in seen_urls: continue
+            seen_urls.add(url)
+            batch.append(url)
+            if len(batch) >= limit - len(final_imgs): break
+        if not batch: break
+        final_imgs += [img for img in download_images(batch) if img]
     return final_imgs
 
+@lru_cache(maxsize=1)
+def get_anthropic_client(anthropic_key):
+    import anthropic
+    return anthropic.Anthropic(api_key=anthropic_key)
+
+@lru_cache(maxsize=256)
+def get_claude_text(anthropic_key, prompt):
+    msg = get_anthropic_client(anthropic_key).messages.create(
+        model=CLAUDE_MODEL, max_tokens=CLAUDE_MAX_TOKENS, system=CLAUDE_SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return msg.content[0].text.strip().translate(CLAUDE_STRIP_TABLE)
+
+def build_post_text(text, tags):
+    """Body text, a blank line, then each unique hashtag as a facet"""
+    from atproto import client_utils
+    tb = client_utils.TextBuilder()
+    tb.text(f"{text}\n\n")
+    for i, t in enumerate(dict.fromkeys(tags)):
+        if i: tb.text(" ")
+        tb.tag(t, t[1:])
+    return tb
+
+def upload_blobs(bsky, payloads):
+    """Uploads independent blobs in parallel; blob refs come back in payload order"""
+    if len(payloads) < 2: return [bsky.upload_blob(p).blob for p in payloads]
+    with ThreadPoolExecutor(max_workers=min(len(payloads), 4)) as ex:
+        return list(ex.map(lambda p: bsky.upload_blob(p).blob, payloads))
+
+def upload_blob_cached(bsky, data):
+    """Reuses this account's blob ref for an identical payload uploaded within BLOB_CACHE_TTL"""
+    from atproto import models
+    key = f"{bsky.me.did}:{hashlib.sha256(data).hexdigest()}"
+    now = time.time()
+    cache = {k: v for k, v in load_json(BLOB_CACHE_FILE, {}).items() if now - v['ts'] < BLOB_CACHE_TTL}
+    if key in cache: return models.blob_ref.BlobRef.model_validate(cache[key]['blob'])
+    blob = bsky.upload_blob(data).blob
+    cache[key] = {'ts': now, 'blob': blob.model_dump(by_alias=True, mode='json')}
+    save_json(BLOB_CACHE_FILE, cache)
+    return blob
+
+def build_image_embed(bsky, images, alt):
+    """Attaches the promo card (33% chance) and uploads up to 4 images as one embed"""
+    from atproto import models
+    payloads = [to_upload_bytes(i) for i in images[:4] if i]
+    add_promo = PROMO_BYTES and len(payloads) < 4 and random.random() < RANDOM_PROMO_CHANCE
+
+    logger.info("📸 Images prepared: %d", len(payloads) + bool(add_promo))
+    blobs = upload_blobs(bsky, payloads)
+    # Promo never changes, so its blob ref is reused instead of re-uploading it every post
+    if add_promo: blobs.append(upload_blob_cached(bsky, PROMO_BYTES))
+    return models.AppBskyEmbedImages.Main(images=[models.AppBskyEmbedImages.Image(alt=alt, image=b) for b in blobs])
+
 # --- CORE HANDLERS ---
 
 def run_rivalry(bsky, api_key, anthropic_key):
-    g_name, g_id = random.choice(list(GENRES.items()))
+    g_name, g_id = random.choice(GENRE_CHOICES)
     games_basic = fetch_games_list(api_key, count=2, genre_id=g_id)
     if len(games_basic) < 2: return
-    g1, g2 = deep_fetch_game(api_key, games_basic[0]['id']), deep_fetch_game(api_key, games_basic[1]['id'])
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        details = ex.map(lambda g: deep_fetch_game(api_key, g['id']), games_basic[:2])
+        g1, g2 = [{**g, **(d or {})} for g, d in zip(games_basic, details)]
     
-    logger.info(f"⚔️ Rivalry: {g1['name']} vs {g2['name']}")
-    p = (f"Briefly compare '{g1['name']}' and '{g2['name']}'. Max 100 chars.")
-    msg = anthropic.Anthropic(api_key=anthropic_key).messages.create(
-        model="claude-3-haiku-20240307", max_tokens=150, messages=[{"role": "user", "content": p}]
-    )
-    text = msg.content[0].text.strip().replace('"', '')
+    logger.info("⚔️ Rivalry: %s vs %s", g1['name'], g2['name'])
+    p = (f"Briefly compare '{g1['name']}' and '{g2['name']}'.")
+    # Claude writes while box art + one screen per game download, both games at once
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        text_future = ex.submit(get_claude_text, anthropic_key, p)
+        g1_screens, g2_screens = ex.map(lambda g: get_deep_images(api_key, g, limit=2), (g1, g2))
+        text = text_future.result()
 
     tags = ["#Retro", "#RetroGaming", "#Rivalry"]
     for g in [g1, g2]:
         t = clean_game_hashtag(g['name'], tags)
         if t: tags.append(t)
-    unique_tags = list(dict.fromkeys(tags))
-
-    tb = client_utils.TextBuilder()
-    tb.text(f"{text[:200]}\n\n")
-    for i, t in enumerate(unique_tags):
-        tb.tag(t, t.replace("#", ""))
-        if i < len(unique_tags)-1: tb.text(" ")
+    tb = build_post_text(text[:200], tags)
 
     final_imgs = []
     # 1. Collage (Box Art 1 + Box Art 2)
-    c1 = download_image(g1.get('background_image_additional') or g1.get('background_image'))
-    c2 = download_image(g2.get('background_image_additional') or g2.get('background_image'))
-    if c1 and c2: final_imgs.append(create_collage([c1, c2]))
+    if g1_screens and g2_screens:
+        final_imgs.append(create_collage([Image.open(BytesIO(g1_screens[0])), Image.open(BytesIO(g2_screens[0]))]))
     
     # 2. Screen from Game 1
-    g1_screens = get_deep_images(api_key, g1, limit=5)
     if len(g1_screens) > 1: final_imgs.append(g1_screens[1])
 
     # 3. Screen from Game 2
-    g2_screens = get_deep_images(api_key, g2, limit=5)
     if len(g2_screens) > 1: final_imgs.append(g2_screens[1])
 
-    # 4. Promo (33% Chance)
-    if random.random() < RANDOM_PROMO_CHANCE and os.path.exists("images/promo_ad.jpg"):
-        with Image.open("images/promo_ad.jpg") as ad: final_imgs.append(ad.copy())
-
-    blobs = [models.AppBskyEmbedImages.Image(alt="Rivalry", image=bsky.upload_blob(image_to_bytes(i)).blob) for i in final_imgs[:4] if i]
-    bsky.send_post(tb, embed=models.AppBskyEmbedImages.Main(images=blobs))
+    bsky.send_post(tb, embed=build_image_embed(bsky, final_imgs, "Rivalry"))
 
 def run_single_game(bsky, api_key, anthropic_key, theme, slot_tag, force_on_this_day=False):
     game, header, now = None, "", datetime.now()
     if force_on_this_day:
-        for _ in range(5):
-            yr = random.randint(1985, 2005)
-            d_str = f"{yr}-{now.strftime('%m-%d')}"
-            res = fetch_games_list(api_key, count=1, dates=f"{d_str},{d_str}")
+        # Probe 5 distinct years in one concurrent burst, keep the first hit in draw order
+        years, md = random.sample(range(1985, 2006), 5), now.strftime('%m-%d')
+        with ThreadPoolExecutor(max_workers=len(years)) as ex:
+            probes = list(ex.map(lambda yr: fetch_games_list(api_key, count=1, dates=f"{yr}-{md},{yr}-{md}"), years))
+        for yr, res in zip(years, probes):
             if res:
                 game, header = res[0], f"📅 On This Day in {yr}\n\n"
                 break
@@ -229,39 +369,47 @@ def run_single_game(bsky, api_key, anthropic_key, theme, slot_tag, force_on_this
         game = res[0] if res else None
     
     if not game: return
-    full = deep_fetch_game(api_key, game['id'])
-    logger.info(f"🎮 Slot: {slot_tag} | Game: {full['name']}")
-
-    p = (f"Write a {theme} post about '{full['name']}'. Max 100 chars.")
-    msg = anthropic.Anthropic(api_key=anthropic_key).messages.create(
-        model="claude-3-haiku-20240307", max_tokens=150, messages=[{"role": "user", "content": p}]
-    )
-    text = msg.content[0].text.strip().replace('"', '')
+    # Detail call adds background_image_additional; list fields (short_screenshots) are kept
+    full = {**game, **(deep_fetch_game(api_key, game['id']) or {})}
+    logger.info("🎮 Slot: %s | Game: %s", slot_tag, full['name'])
+
+    p = (f"Write a {theme} post about '{full['name']}'.")
+    # --- Unified 3+1 Image Logic --- (downloads overlap the Claude call)
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        text_future = ex.submit(get_claude_text, anthropic_key, p)
+        final_imgs = get_deep_images(api_key, full, limit=3)
+        text = text_future.result()
     
     tags = ["#Retro", "#RetroGaming", slot_tag] + get_platform_tags(full)
     gtag = clean_game_hashtag(full['name'], tags)
     if gtag: tags.append(gtag)
-    unique_tags = list(dict.fromkeys(tags))
 
     display_text = f"{header}{text}"
     if len(display_text) > 240: display_text = display_text[:237] + "..."
-    
-    tb = client_utils.TextBuilder()
-    tb.text(f"{display_text}\n\n")
-    for i, t in enumerate(unique_tags):
-        tb.tag(t, t.replace("#", ""))
-        if i < len(unique_tags)-1: tb.text(" ")
-        
-    # --- Unified 3+1 Image Logic ---
-    final_imgs = get_deep_images(api_key, full, limit=3)
-            
-    if random.random() < RANDOM_PROMO_CHANCE and os.path.exists("images/promo_ad.jpg"):
-        with Image.open("images/promo_ad.jpg") as ad: final_imgs.append(ad.copy())
-        
-    logger.info(f"📸 Images prepared: {len(final_imgs)}")
-    blobs = [models.AppBskyEmbedImages.Image(alt=full['name'], image=bsky.upload_blob(image_to_bytes(i)).blob) for i in final_imgs[:4] if i]
-    bsky.send_post(tb, embed=models.AppBskyEmbedImages.Main(images=blobs))
-    save_json('history_games.json', (load_json('history_games.json', []) + [full['id']])[-2000:])
+    tb = build_post_text(display_text, tags)
+
+    bsky.send_post(tb, embed=build_image_embed(bsky, final_imgs, full['name']))
+    record_game_history(full['id'])
+
+# --- DISPATCH ---
+
+SLOT_HANDLERS = {
+    1: partial(run_single_game, theme="nostalgic memory", slot_tag="#Nostalgia"),
+    2: partial(run_single_game, theme="quick spotlight", slot_tag="#ClassicGaming"),
+    3: run_rivalry,
+    4: partial(run_single_game, theme="unpopular opinion", slot_tag="#UnpopularOpinion"),
+    6: partial(run_single_game, theme="hidden gem", slot_tag="#HiddenGem"),
+    8: partial(run_single_game, theme="tribute to the developers", slot_tag="#RetroDev"),
+    9: partial(run_single_game, theme="cool historical fact", slot_tag="#RetroGaming"),
+    10: partial(run_single_game, theme="visual style and art direction", slot_tag="#BoxArt"),
+    11: partial(run_single_game, theme="relaxing weekend morning", slot_tag="#RetroGaming"),
+    12: partial(run_single_game, theme="Sunday afternoon playthrough", slot_tag="#RetroGaming"),
+    13: partial(run_single_game, theme="anniversary", slot_tag="#OnThisDay", force_on_this_day=True),
+    14: partial(run_single_game, theme="legacy and impact", slot_tag="#OnThisDay", force_on_this_day=True),
+    15: partial(run_single_game, theme="historical release context", slot_tag="#OnThisDay", force_on_this_day=True),
+    17: partial(run_single_game, theme="gameplay mechanics deep dive", slot_tag="#RetroGaming"),
+    18: run_rivalry,
+}
 
 def main():
     logger.info("--- 🚀 START ---")
@@ -272,50 +420,38 @@ def main():
 
     if not handle or not password: return
 
-    try:
-        bsky = Client()
-        bsky.login(handle, password)
-        logger.info("Login Successful")
-    except Exception as e:
-        logger.error(f"Login Error: {e}")
-        return
-
     f = os.environ.get("FORCED_SLOT", "")
     man = os.environ.get("IS_MANUAL") == "true"
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
+    day, hour = now.weekday(), now.hour
     
     slot_id = None
-    if man and f and "Slot" in f:
-        match = re.search(r'Slot\s*(\d+)', f)
-        if match: slot_id = int(match.group(1))
+    match = SLOT_RE.search(f) if man else None
+    if match: slot_id = int(match.group(1))
     
     if slot_id is None:
-        slot_id = SCHEDULE.get(now.weekday(), {}).get(now.hour)
+        slot_id = SCHEDULE_FLAT[day * 24 + hour]
     
     if not slot_id:
-        logger.info(f"No slot for Hour {now.hour}")
+        logger.info("No slot for Hour %s", hour)
         return
 
-    handlers = {
-        1: lambda b: run_single_game(b, rawg_key, anthropic_key, "nostalgic memory", "#Nostalgia"),
-        9: lambda b: run_single_game(b, rawg_key, anthropic_key, "cool historical fact", "#RetroGaming"),
-        4: lambda b: run_single_game(b, rawg_key, anthropic_key, "unpopular opinion", "#UnpopularOpinion"),
-        6: lambda b: run_single_game(b, rawg_key, anthropic_key, "hidden gem", "#HiddenGem"),
-        11: lambda b: run_single_game(b, rawg_key, anthropic_key, "relaxing weekend morning", "#RetroGaming"),
-        2: lambda b: run_single_game(b, rawg_key, anthropic_key, "quick spotlight", "#ClassicGaming"),
-        3: lambda b: run_rivalry(b, rawg_key, anthropic_key),
-        18: lambda b: run_rivalry(b, rawg_key, anthropic_key),
-        17: lambda b: run_single_game(b, rawg_key, anthropic_key, "gameplay mechanics deep dive", "#RetroGaming"),
-        8: lambda b: run_single_game(b, rawg_key, anthropic_key, "tribute to the developers", "#RetroDev"),
-        10: lambda b: run_single_game(b, rawg_key, anthropic_key, "visual style and art direction", "#BoxArt"),
-        12: lambda b: run_single_game(b, rawg_key, anthropic_key, "Sunday afternoon playthrough", "#RetroGaming"),
-        13: lambda b: run_single_game(b, rawg_key, anthropic_key, "anniversary", "#OnThisDay", True),
-        14: lambda b: run_single_game(b, rawg_key, anthropic_key, "legacy and impact", "#OnThisDay", True),
-        15: lambda b: run_single_game(b, rawg_key, anthropic_key, "historical release context", "#OnThisDay", True)
-    }
-    
-    if slot_id in handlers:
-        handlers[slot_id](bsky)
+    handler = SLOT_HANDLERS.get(slot_id)
+    if not handler:
+        logger.error("❌ Unknown Slot ID: %s", slot_id)
+        return
+
+    # Login only once we know there is something to post
+    from atproto import Client
+    try:
+        bsky = Client()
+        bsky.login(handle, password)
+        logger.info("Login Successful")
+    except Exception as e:
+        logger.error("Login Error: %s", e)
+        return
+
+    handler(bsky, rawg_key, anthropic_key)
     
     logger.info("--- 🏁 END ---")
 